@@ -7,15 +7,20 @@ the metadata file is /path/to/foo.pmm.
 
 from __future__ import division
 
+import errno
+import json
+import numbers
 import os
 import datetime
 import numpy as np
+import pandas as pd
 import sys
 
 try:
+    import pyarrow as pa
     import pyarrow.feather as feather
 except ImportError:
-    feather = None
+    pa = feather = None
 
 from pmmif import pmm
 
@@ -26,6 +31,19 @@ NULL_STRING = '∅'
 NULL_SUFFIX = '_' + NULL_STRING
 UTF8 = 'UTF-8'
 
+_FIELD_TYPES = frozenset(pmm.FIELD_TYPES)
+
+# PMM types for each numpy dtype kind. The values in object columns
+# are examined to distinguish booleans and dates from strings.
+_KIND_TO_PMM_TYPE = {
+    'b': 'boolean',
+    'i': 'integer',
+    'u': 'integer',
+    'f': 'real',
+    'O': 'string',
+    'M': 'datestamp',
+}
+
 isPython2 = sys.version_info.major < 3
 if isPython2:
     bytes_type = str                # type: type
@@ -34,6 +52,9 @@ else:
     bytes_type = bytes
     unicode_type = str
 
+# accept path-like objects (e.g. pathlib.Path) where os.fspath exists
+_fspath = getattr(os, 'fspath', lambda path: path)
+
 
 class Dataset(object):
     """
@@ -102,7 +123,8 @@ class Dataset(object):
         The type, if provided, must be one of the types described for
         add_field, above.
         """
-        if self.df[name].isnull().all():  # all null or no records
+        if (pmmtype in ('string', 'datestamp')
+                and self.df[name].isnull().all()):  # all null or no records
             if pmmtype == 'string':
                 self.df[name] = self.df[name].astype(np.dtype('O'))
             elif pmmtype == 'datestamp':
@@ -164,12 +186,11 @@ class Dataset(object):
             2. the fields parameter is a list but field is not in the list
 
         """
-        newfields = [fx.name for fx in other.md.fields]
-        for f in newfields:
-            if (fields is None) or (f in fields):
-                if f in [fx.name for fx in self.md.fields]:
-                    del self.md.fields[[fx.name
-                                        for fx in self.md.fields].index(f)]
+        newfields = set(fx.name for fx in other.md.fields)
+        if fields is not None:
+            newfields &= set(fields)
+        self.md.fields = [fx for fx in self.md.fields
+                          if fx.name not in newfields]
         _add_metadata_from_other_dataset(self.md, other.md)
         _reset_fields_from_dataframe(self)
 
@@ -181,12 +202,28 @@ class Dataset(object):
         for any fields that only exist in the second one is added to the
         first one.
         """
-        self.df = self.df.append(other.df, ignore_index=True)
+        self.df = pd.concat([self.df, other.df], ignore_index=True,
+                            copy=False)
         _add_metadata_from_other_dataset(self.md, other.md)
         _reset_fields_from_dataframe(self)
 
+    def extend(self, others):
+        """
+        Append a sequence of other datasets to an existing one.
+
+        This is equivalent to calling append for each of the other
+        datasets in turn, but the dataframes are concatenated in a single
+        operation, rather than copying the growing dataframe each time.
+        """
+        others = list(others)
+        self.df = pd.concat([self.df] + [other.df for other in others],
+                            ignore_index=True, copy=False)
+        for other in others:
+            _add_metadata_from_other_dataset(self.md, other.md)
+        _reset_fields_from_dataframe(self)
+
 
-def read_dataframe(featherpath):
+def read_dataframe(featherpath, memory_map=False):
     """
     Similar to feather.read_dataframe except that it also reads the
     corresponding .pmm file, if present, and returns a Dataset
@@ -194,20 +231,27 @@ def read_dataframe(featherpath):
 
     The Dataset object contains the Pandas dataframe in its df attribute,
     and the metadata in its md attribute.
+
+    If memory_map is set, the feather file is memory-mapped rather than
+    read into memory, which avoids a copy for large files. (On some
+    platforms, the file then can't be replaced while it is still mapped.)
     """
     if feather is None:
         raise Exception('Feather-format is not available')
-    df = feather.read_feather(featherpath)
+    df = feather.read_feather(featherpath, memory_map=memory_map)
     pmmpath, datasetname = _split_feather_path(featherpath)
-    if os.path.exists(pmmpath):
+    try:
         md = pmm.load(pmmpath)
-    else:
+    except IOError as e:
+        if e.errno != errno.ENOENT:
+            raise
         md = _create_pmm_metadata(df, datasetname)
-    df = _recover_problematical_all_null_columns(Dataset(df, md))
-    return Dataset(df, md)
+    ds = Dataset(df, md)
+    ds.df = _recover_problematical_all_null_columns(ds)
+    return ds
 
 
-def write_dataframe(dataset, featherpath):
+def write_dataframe(dataset, featherpath, compression=None, chunksize=None):
     """
     Similar to feather.write_dataframe except that it also writes a
     corresponding .pmm file, and expects a Dataset object rather than a
@@ -215,9 +259,22 @@ def write_dataframe(dataset, featherpath):
 
     The Dataset object contains the Pandas dataframe in its df attribute,
     and the metadata in its md attribute.
+
+    The compression, if provided, must be one of 'lz4', 'zstd' or
+    'uncompressed'; by default, LZ4 is used if it is available.
+    The chunksize, if provided, must be a positive integer, and is the
+    maximum number of records in each record batch in the feather file.
+    The dataframe is then converted and written one record batch at a
+    time, so that the whole dataframe is not converted to Arrow at once.
     """
     if feather is None:
         raise Exception('Feather-format is not available')
+    if chunksize is not None and (isinstance(chunksize, bool)
+                                  or not isinstance(chunksize,
+                                                    numbers.Integral)
+                                  or chunksize <= 0):
+        raise ValueError('chunksize must be a positive integer, not %r'
+                         % (chunksize,))
     pmmpath, datasetname = _split_feather_path(featherpath)
     if dataset.md is None:
         dataset.md = _create_pmm_metadata(dataset.df, datasetname)
@@ -229,7 +286,10 @@ def write_dataframe(dataset, featherpath):
         # feather doesn't always write file correctly if it already exists
         if os.path.exists(featherpath):
             os.remove(featherpath)
-        feather.write_feather(df, featherpath)
+        if chunksize is not None:
+            _write_feather_in_chunks(df, featherpath, compression, chunksize)
+        else:
+            feather.write_feather(df, featherpath, compression=compression)
         dataset.md.save(pmmpath)
     except:
         # feather leaves dud files around if it fails to write
@@ -254,29 +314,48 @@ def _sanitize_problematical_all_null_columns(ds):
     and the pandas column name gets a '_∅t' appended, where t is a
     type indicator --- b for boolean, s for string or u for unknown.
     """
-    origdf, md = ds.df, ds.md
-    df = origdf[list(origdf)]       # Copye
+    df, md = ds.df, ds.md
     nTransformed = 0
     fieldnames = list(df.columns)
     nRecords = len(df.index)
     dfIsUnicode = fieldnames and type(fieldnames[0]) == unicode_type
     fn = _unicode_definite if dfIsUnicode else _utf8_definite
     null_suffix = fn(NULL_SUFFIX)
+
+    # Only string columns, or boolean columns with no records, can be
+    # problematical, so pick those out from the dtypes (without touching
+    # the data), then find the all-null ones with a single vectorized scan.
+    candidates = [f for (f, dtype) in zip(fieldnames, df.dtypes)
+                  if dtype == PANDAS_STRING_DTYPE
+                     or (dtype == PANDAS_BOOL_DTYPE and nRecords == 0)]
+    if not candidates:
+        return df
+    isAllNull = df[candidates].isnull().all(axis=0)
+    allNull = set(isAllNull.index[isAllNull.values])
+    if not allNull:
+        return df
+    existing = set(fieldnames)
+
+    # Only copy the dataframe when there is something to transform;
+    # a shallow copy shares the data but keeps new columns off ds.df.
+    df = df.copy(deep=False)
+    # the sanitized dataframe is only written out, so the transformed
+    # columns can safely share a single array of NaNs.
+    nulls = np.full(nRecords, np.nan, dtype=PANDAS_FLOAT_DTYPE)
+    pmmtypes = dict((fx.name, fx.type) for fx in md.fields)
+
     for i, f in enumerate(fieldnames):
-        if (df[f].dtype not in (PANDAS_STRING_DTYPE, PANDAS_BOOL_DTYPE)
-                or df[f].notnull().sum() > 0):  # includes bools with nulls
+        if f not in allNull:
             continue
-        if df[f].dtype == PANDAS_BOOL_DTYPE and nRecords > 0:
-            continue
-        typeChar = ('b' if md[f].type == 'boolean'
-                        else 's' if md[f].type == 'string'
+        typeChar = ('b' if pmmtypes[f] == 'boolean'
+                        else 's' if pmmtypes[f] == 'string'
                         else 'u')
         altname = f + null_suffix + typeChar
-        if altname in fieldnames:
+        if altname in existing:
             continue  # already there. Whatever...
             # restore any all-null string fields
-        df[altname] = np.array([np.nan] * nRecords,
-                               dtype=PANDAS_FLOAT_DTYPE)
+        df[altname] = nulls
+        existing.add(altname)
         nTransformed += 1
         fieldnames[i] = altname
     if nTransformed > 0:
@@ -292,23 +371,32 @@ def _recover_problematical_all_null_columns(ds):
     df, md = ds.df, ds.md
     nTransformed = 0
     fieldnames = list(df.columns)
-    nRecords = len(df.index)
     dfIsUnicode = fieldnames and type(fieldnames[0]) == unicode_type
     fn = _unicode_definite if dfIsUnicode else _utf8_definite
     null_suffix = fn(NULL_SUFFIX)
-    for i, f in enumerate(fieldnames):
-        if f[:-1].endswith(null_suffix) and all(np.isnan(df[f])):
-            suffixLen = len(null_suffix) + 1
-            suffix = f[-suffixLen:]
+    suffixes = tuple(null_suffix + fn(c) for c in 'bsu')
+
+    # Check the names first, so that (in the usual case where nothing
+    # was sanitized) the data is returned untouched without examining it.
+    candidates = [i for (i, f) in enumerate(fieldnames)
+                  if f.endswith(suffixes)]
+    if not candidates:
+        return df
+
+    nRecords = len(df.index)
+    suffixLen = len(null_suffix) + 1
+    for i in candidates:
+        f = fieldnames[i]
+        if df[f].isnull().all():
             truename = f[:-suffixLen]
-            typeChar  = suffix[-1]
+            typeChar = f[-1:]
             if truename in df:
                 continue  # Both there; makes no sense; leave
             # restore any all-null string fields
             type_ = PANDAS_STRING_DTYPE
             if (typeChar == 'b' and nRecords == 0):
                 type_ = PANDAS_BOOL_DTYPE
-            df[truename] = np.array(np.ones(nRecords) * np.nan, type_)
+            df[truename] = np.full(nRecords, np.nan, dtype=type_)
             nTransformed += 1
             fieldnames[i] = truename
     if nTransformed > 0:
@@ -316,17 +404,89 @@ def _recover_problematical_all_null_columns(ds):
     return df
 
 
+def _write_feather_in_chunks(df, featherpath, compression, chunksize):
+    """
+    Writes a dataframe to a feather (V2, i.e. Arrow IPC) file one record
+    batch at a time. Unlike feather.write_feather, this doesn't normally
+    convert the whole dataframe to an Arrow table at once.
+
+    The schema is inferred from the first chunk (see _chunked_schema).
+    If a later chunk doesn't match it (e.g. an object column holding
+    values of different types), the file is rewritten using a schema
+    inferred from the whole dataframe, as feather.write_feather would.
+    """
+    if compression is None:
+        # same default as feather.write_feather
+        compression = 'lz4' if pa.Codec.is_available('lz4') else None
+    elif compression == 'uncompressed':
+        compression = None
+    options = pa.ipc.IpcWriteOptions(compression=compression)
+    try:
+        schema = _chunked_schema(df, chunksize)
+        _write_record_batches(df, featherpath, schema, options, chunksize)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        schema = pa.Schema.from_pandas(df, preserve_index=None)
+        _write_record_batches(df, featherpath, schema, options, chunksize)
+
+
+def _write_record_batches(df, featherpath, schema, options, chunksize):
+    with pa.ipc.new_file(featherpath, schema, options=options) as writer:
+        for start in range(0, len(df.index), chunksize):
+            chunk = df.iloc[start:start + chunksize]
+            writer.write_batch(pa.RecordBatch.from_pandas(
+                chunk, schema=schema, preserve_index=None))
+
+
+def _chunked_schema(df, chunksize):
+    """
+    Returns the Arrow schema for writing a dataframe in chunks, inferred
+    from its first chunk rather than from the whole dataframe.
+
+    Object columns that are all null in the first chunk would be given
+    the null type, so for each of these, the first non-null value
+    in the whole column (if there is one) is used in place of the
+    first value in the chunk. The pandas metadata for a range index
+    is also corrected to describe the whole index, not just the chunk.
+    """
+    sample = df.iloc[:chunksize]
+    schema = pa.Schema.from_pandas(sample, preserve_index=None)
+    copied = False
+    for i in range(len(df.columns)):
+        if (pa.types.is_null(schema.field(i).type)
+                and df.dtypes.iloc[i] == PANDAS_STRING_DTYPE):
+            value = _first_non_null_value(df.iloc[:, i])
+            if value is not None:
+                if not copied:
+                    sample = sample.copy()
+                    copied = True
+                sample.iloc[0, i] = value
+    if copied:
+        schema = pa.Schema.from_pandas(sample, preserve_index=None)
+
+    metadata = schema.metadata or {}
+    if b'pandas' in metadata and isinstance(df.index, pd.RangeIndex):
+        pandas_metadata = json.loads(metadata[b'pandas'].decode(UTF8))
+        for index in pandas_metadata.get('index_columns', []):
+            if isinstance(index, dict) and index.get('kind') == 'range':
+                index.update(start=df.index.start, stop=df.index.stop,
+                             step=df.index.step)
+        metadata = dict(metadata)
+        metadata[b'pandas'] = json.dumps(pandas_metadata).encode(UTF8)
+        schema = schema.with_metadata(metadata)
+    return schema
+
+
 def _split_feather_path(path):
     """
     Returns path to the corresponding PMM file and the dataset name
     from the feather path given.
     """
-    pathbody, ext = os.path.splitext(path)
+    pathbody, ext = os.path.splitext(_fspath(path))
     if ext.startswith('.feather'):
         pmmpath = pathbody + '.pmm' + ext[8:]
     else:
         pmmpath = pathbody + '.pmm'
-    datasetname = os.path.split(pathbody)[1]
+    datasetname = os.path.basename(pathbody)
     return pmmpath, datasetname
 
 
@@ -335,7 +495,8 @@ def _create_pmm_metadata(df, name):
     Creates a vanilla PMM Metadata struture from a data frame.
     """
     nRecords = len(df.index)
-    fields = [_create_pmm_field(df[col]) for col in df]
+    fields = [pmm.Field(colname, pmmtype, role='', tags={}, stats={})
+              for (colname, pmmtype) in zip(df.columns, _pmm_types(df))]
     return pmm.Metadata(name, nRecords, fields, tags={})
 
 
@@ -347,34 +508,79 @@ def _create_pmm_field(col, pmmtype=None):
                      tags={}, stats={})
 
 
+def _pmm_types(df):
+    """
+    Maps the Pandas types of all the columns of a data frame to PMM types.
+
+    The types are mostly determined from df.dtypes alone; only the
+    object columns need to be examined individually.
+    """
+    pmmtypes = [_dtype_pmm_type(dtype) for dtype in df.dtypes]
+    for i, pmmtype in enumerate(pmmtypes):
+        if pmmtype == 'string':
+            pmmtypes[i] = _object_pmm_type(df.iloc[:, i])
+    return pmmtypes
+
+
 def _pmm_type(col, pmmtype=None):
     """
     Maps Pandas types to PMM types
     """
     if pmmtype:
-        if pmmtype not in pmm.FIELD_TYPES:
+        if pmmtype not in _FIELD_TYPES:
             raise ValueError('Unknown PMM type: %s:' % pmmtype)
         return pmmtype
-    s = str(col.dtype)
-    if s == 'bool':
+    pmmtype = _dtype_pmm_type(col.dtype)
+    if pmmtype == 'string':
+        return _object_pmm_type(col)
+    return pmmtype
+
+
+def _dtype_pmm_type(dtype):
+    """
+    Maps a Pandas dtype to a PMM type, with all object columns
+    mapped to 'string'.
+    """
+    pmmtype = _KIND_TO_PMM_TYPE.get(dtype.kind)
+    if pmmtype is None or (pmmtype == 'string'
+                           and dtype != PANDAS_STRING_DTYPE):
+        # e.g. complex, timedelta, categorical
+        raise TypeError('Unknown type: %s [%s]' % (dtype, repr(dtype)))
+    return pmmtype
+
+
+def _object_pmm_type(col):
+    """
+    Determines the PMM type of an object column from its first non-null
+    value, which might be a boolean or a date rather than a string.
+    """
+    somevalue = _first_non_null_value(col)
+    if type(somevalue) is bool:
         return 'boolean'
-    elif s.startswith('int'):
-        return 'integer'
-    elif s.startswith('float'):
-        return 'real'
-    elif s == 'object':
-        someindex = col.first_valid_index()
-        if someindex is not None:
-            somevalue = col[someindex]
-            if type(somevalue) is bool:
-                return 'boolean'
-            elif type(somevalue) in (datetime.datetime, datetime.date):
-                return 'datestamp'
-        return 'string'
-    elif s.startswith('date'):
+    elif type(somevalue) in (datetime.datetime, datetime.date):
         return 'datestamp'
-    else:
-        raise TypeError('Unknown type: %s [%s]' % (s, repr(col.dtype)))
+    return 'string'
+
+
+def _first_non_null_value(col):
+    """
+    Returns the first non-null value in a column, or None if there isn't one.
+
+    This looks at the underlying array in blocks of increasing size,
+    so that (unlike first_valid_index) it normally only examines the
+    first few values, while still being vectorized for columns that
+    start with a long run of nulls.
+    """
+    values = col.values
+    start, blocksize = 0, 32
+    while start < len(values):
+        block = values[start:start + blocksize]
+        nonnull = np.flatnonzero(pd.notnull(block))
+        if len(nonnull) > 0:
+            return block[nonnull[0]]
+        start += blocksize
+        blocksize *= 2
+    return None
 
 
 def _reset_fields_from_dataframe(dataset):
@@ -384,26 +590,20 @@ def _reset_fields_from_dataframe(dataset):
     """
     df, md = dataset.df, dataset.md
     dfFieldnames = list(df)
-    mdFieldnames = [f.name for f in md.fields]
-
-    dfOnlyFieldnames = set(dfFieldnames) - set(mdFieldnames)
-    mdOnlyFieldnames = set(mdFieldnames) - set(dfFieldnames)
-
-    for f in dfOnlyFieldnames:
-        md.fields.append(_create_pmm_field(df[f]))
-    assert(mdOnlyFieldnames.intersection(set([f.name for f in md.fields]))
-           == mdOnlyFieldnames)
-
-    # Remove metadata for fields that aren't in the dataframe
-    for f in mdOnlyFieldnames:
-        del md.fields[[fx.name for fx in md.fields].index(f)]
-
-    orderOK = True
-    for i, f in enumerate(list(md.fields)):
-        if not f.name == dfFieldnames[i]:
-            orderOK = False
-    if not orderOK:
-        md.fields = [md[f] for f in dfFieldnames]
+
+    # Usually (e.g. when rewriting a dataset whose fields haven't changed)
+    # the metadata already has exactly the dataframe's fields, in order.
+    if dfFieldnames != [f.name for f in md.fields]:
+        # Index the metadata by name once, rather than searching md.fields
+        # for each field, which is quadratic for wide dataframes.
+        byName = dict((f.name, f) for f in md.fields)
+        for f in dfFieldnames:
+            if f not in byName:
+                byName[f] = _create_pmm_field(df[f])
+
+        # Drops metadata for fields that aren't in the dataframe,
+        # and puts the rest into dataframe order.
+        md.fields = [byName[f] for f in dfFieldnames]
     md.fieldcount = len(md.fields)
     md.recordcount = len(df)
 
@@ -413,11 +613,11 @@ def _add_metadata_from_other_dataset(md, othermd):
     Extend md with fields from othermd not present in md.
     (No consistency checking.)
     """
-    fields = [f.name for f in md.fields]
-    otherFields = [f.name for f in othermd.fields]
-    otherOnlyFields = set(otherFields) - set(fields)
-    for f in otherOnlyFields:
-        md.fields.append(othermd[f])
+    fields = set(f.name for f in md.fields)
+    for f in othermd.fields:
+        if f.name not in fields:
+            md.fields.append(f)
+            fields.add(f.name)
     md.fieldcount = len(md.fields)
 
 
@@ -441,19 +641,10 @@ def _utf8_definite(s):
 
 def _utf8_definite_object(s):
     """
-    Converts all unicode within scalar or object, recursively, to unicode.
+    Converts all unicode within scalar or object, recursively, to UTF-8.
     Handles lists, tuples and dictionaries, as well as scalars.
     """
-    if type(s) == unicode_type:
-        return s.encode(UTF8)
-    elif type(s) == list:
-        return [_utf8_definite_object(v) for v in s]
-    elif type(s) == tuple:
-        return tuple([_utf8_definite_object(v) for v in s])
-    elif type(s) == dict:
-        return {_utf8_definite_object(k): _utf8_definite_object(v)
-                for (k, v) in s.items()}
-    return s
+    return _UTF8_DEFINITE_CONVERTERS.get(type(s), _identity)(s)
 
 
 def _unicode_definite_object(s):
@@ -461,18 +652,32 @@ def _unicode_definite_object(s):
     Converts all bytes within scalar or object, recursively, to unicode.
     Handles lists, tuples and dictionaries, as well as scalars.
     """
-    if type(s) == bytes_type:
-        return s.decode(UTF8)
-    elif type(s) == list:
-        return [_unicode_definite_object(v) for v in s]
-    elif type(s) == tuple:
-        return tuple([_unicode_definite_object(v) for v in s])
-    elif type(s) == dict:
-        return {unicode_definite_object(k): _unicode_definite_object(v)
-                for (k, v) in s.items()}
+    return _UNICODE_DEFINITE_CONVERTERS.get(type(s), _identity)(s)
+
+
+def _identity(s):
     return s
 
 
+# Converters for the _*_definite_object functions, keyed on exact type,
+# so that each value needs only a single dictionary lookup.
+_UTF8_DEFINITE_CONVERTERS = {
+    unicode_type: lambda s: s.encode(UTF8),
+    list: lambda s: [_utf8_definite_object(v) for v in s],
+    tuple: lambda s: tuple([_utf8_definite_object(v) for v in s]),
+    dict: lambda s: {_utf8_definite_object(k): _utf8_definite_object(v)
+                     for (k, v) in s.items()},
+}
+
+_UNICODE_DEFINITE_CONVERTERS = {
+    bytes_type: lambda s: s.decode(UTF8),
+    list: lambda s: [_unicode_definite_object(v) for v in s],
+    tuple: lambda s: tuple([_unicode_definite_object(v) for v in s]),
+    dict: lambda s: {_unicode_definite_object(k): _unicode_definite_object(v)
+                     for (k, v) in s.items()},
+}
+
+
 if isPython2:
     _str_definite_object = _utf8_definite_object
     _str_definite = _utf8_definite
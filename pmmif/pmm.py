@@ -7,17 +7,35 @@ from __future__ import division
 from __future__ import unicode_literals
 import json
 import datetime
+import math
+import re
 import sys
-from collections import OrderedDict, Counter
+from collections import OrderedDict
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 PMM_VERSION = '0.1'
 DEFAULT_DATE_TAG_FORMAT = '%Y-%m-%d %H:%M:%S'
 
-if sys.version_info.major < 3:
+# Layout for PMM JSON files. The explicit separators avoid trailing
+# spaces after commas at the ends of lines (the default on Python 2).
+JSON_FORMAT = {'indent': 4, 'separators': (',', ': ')}
+
+PY2 = sys.version_info.major < 3
+
+if PY2:
     STRING_TYPE = unicode
 else:
     STRING_TYPE = str
 
+if sys.version_info >= (3, 7):
+    ORDERED_DICT_TYPE = dict    # plain dicts preserve insertion order
+else:
+    ORDERED_DICT_TYPE = OrderedDict
+
 
 
 class PMMError(Exception):
@@ -48,10 +66,143 @@ class ROLE(object):
              VALIDATION, IGNORE, UNSPECIFIED)
 
 
+# Shared fallback for missing tags. Only ever read, never modified.
+_EMPTY = {}
+
 FIELD_TYPES = ['boolean', 'integer', 'real', 'string', 'datestamp']
+_FIELD_TYPE_SET = frozenset(FIELD_TYPES)     # for fast membership tests
+
+
+if PY2:
+    def _py2_str(val):
+        """
+        Converts a value to a (byte) str on Python 2, encoding unicode
+        strings as UTF-8.
+        """
+        if isinstance(val, str):
+            return val
+        return val.encode('UTF-8') if isinstance(val, unicode) else str(val)
+
+
+def _converter(type_):
+    """
+    Returns a function to convert a value to the type given, for setting
+    an attribute of a PMMType. The type can be any (for no conversion),
+    a type, or a list containing a single type (for a list of values
+    of that type).
+    """
+    # if type_ is a list of types, process the inside of the list
+    if isinstance(type_, (tuple, list)) and len(type_) == 1:
+        convert_item = _converter(type_[0])
+
+        def convert(val):
+            if isinstance(val, _LazyFieldList):
+                return val      # fields are converted as they are accessed
+            if not isinstance(val, (tuple, list)):
+                raise TypeError('Expected a list, not %s'
+                                % type(val).__name__)
+            return [convert_item(v) for v in val]
+
+    # if type_ is unspecified, we're good
+    elif type_ is any:
+        def convert(val):
+            return val
+
+    # if it's a PMMType instantiated with a dict, treat as kwargs
+    elif issubclass(type_, PMMType):
+        def convert(val):
+            if isinstance(val, type_):
+                return val
+            elif isinstance(val, dict):
+                return type_(**val)
+            else:
+                return type_(val)
+
+    elif PY2 and type_ == str:
+        convert = _py2_str
+
+    # otherwise, unless val already matches, let type_ try to construct
+    # an instance from val (will raise an error if it's incompatible)
+    else:
+        def convert(val):
+            return val if isinstance(val, type_) else type_(val)
+
+    return convert
+
+
+class _PMMTypeMeta(type):
+    """
+    Metaclass for PMMType, which works out, once for each class, the
+    information about its attributes needed when constructing instances.
+
+    It also gives each class __slots__ for its attributes (unless the class
+    defines __slots__ itself), so that instances don't need a __dict__.
+    Any other instance attributes a class needs should be listed in its
+    _extra_slots.
+    """
+    def __new__(meta, name, bases, namespace):
+        if '__slots__' not in namespace:
+            keys = []
+            for spec in ('required', 'defaulted', 'optional', '_extra_slots'):
+                keys.extend(namespace.get(spec, ()))
+            inherited = set()
+            for base in bases:
+                for klass in base.__mro__:
+                    inherited.update(getattr(klass, '__slots__', ()))
+            namespace['__slots__'] = tuple([key for key in keys
+                                            if key not in inherited])
+        return super(_PMMTypeMeta, meta).__new__(meta, name, bases,
+                                                 namespace)
+
+    def __init__(cls, name, bases, namespace):
+        super(_PMMTypeMeta, cls).__init__(name, bases, namespace)
+
+        # convenience class attribute with type for each attribute
+        cls.typemap = dict([(key, type_)
+                            for (key, (type_, default_))
+                                in cls.defaulted.items()])
+        cls.typemap.update(cls.required)
+        cls.typemap.update(cls.optional)
+
+        cls._required_keys = tuple(cls.required)
+        cls._positional_keys = cls._required_keys + tuple(cls.defaulted)
+        cls._all_keys = cls._positional_keys + tuple(cls.optional)
+        cls._defaulted_items = tuple([(key, default_)
+                                      for (key, (type_, default_))
+                                          in cls.defaulted.items()])
+        cls._converters = dict([(key, _converter(type_))
+                                for (key, type_) in cls.typemap.items()])
+        for key in cls._interned:
+            cls._converters[key] = _interning(cls._converters[key])
+
+
+_intern = getattr(sys, 'intern', None) or intern    # builtin on Python 2
+
+
+def _interning(convert):
+    """
+    Returns a version of the converter given that interns the strings it
+    returns, so that attributes that often have the same value share a
+    single string object (and compare by identity when they do).
+    """
+    def convert_and_intern(val):
+        val = convert(val)
+        return _intern(val) if type(val) is str else val
+    return convert_and_intern
+
+
+def _with_metaclass(meta, base=object):
+    """
+    Returns a temporary base class, which creates classes derived from it
+    using the given metaclass (in both Python 2 and Python 3).
+    """
+    class metaclass(meta):
+        def __new__(cls, name, this_bases, namespace):
+            return meta(name, (base,), namespace)
+    return type.__new__(metaclass, str('temporary_class'), (), {})
 
 
-class PMMType(object):
+class PMMType(_with_metaclass(_PMMTypeMeta)):
     """
     Template class used to specify each element of the PMM format.
 
@@ -72,6 +223,7 @@ class PMMType(object):
     defaulted = OrderedDict(())  # name -> (type, default)
     optional = OrderedDict(())   # name -> type
     # note use type=any to avoid specifying a specific type for an attribute
+    _interned = ()               # names of string attributes to intern
 
     def __init__(self, *args, **kwargs):
         """
@@ -79,21 +231,16 @@ class PMMType(object):
         arguments corresponding to the required, defaulted and optional args
         defined for the class
         """
-
-        # convenience class attribute with type for each attribute
-        if not hasattr(self.__class__, 'typemap'):
-            self.__class__.typemap = dict([(name, type_)
-                                          for (name, (type_, default_))
-                                              in self.defaulted.items()])
-            self.__class__.typemap.update(self.required)
-            self.__class__.typemap.update(self.optional)
+        assigned = set()    # names of attributes set to values other than None
 
         # first do the keyword arguments
         for key, val in kwargs.items():
             self._setattr(key, val)
+            if val is not None:
+                assigned.add(key)
 
         # then do the positional paramters
-        keys = list(self.required.keys()) + list(self.defaulted.keys())
+        keys = self._positional_keys
         if len(args) > len(keys):
             raise PMMError('Constructor for %s takes at most %d '
                            'positional arguments, %d given'
@@ -101,15 +248,17 @@ class PMMType(object):
 
         for key, val in zip(keys, args):
             self._setattr(key, val)
+            if val is not None:
+                assigned.add(key)
 
         # now do any remaining defaulted args
-        for key, (type_, default_) in self.defaulted.items():
-            if not hasattr(self, key):
+        for key, default_ in self._defaulted_items:
+            if key not in assigned:
                 self._setattr(key, default_)
 
         # check that we've got all the required args
-        for key in self.required:
-            if not hasattr(self, key) or self.__dict__[key] is None:
+        for key in self._required_keys:
+            if key not in assigned:
                 raise PMMError('Constructor for %s missing required '
                                'argument %s' % (self.__class__.__name__,
                                 key))
@@ -120,52 +269,42 @@ class PMMType(object):
                            % (key, self.__class__.__name__))
         elif val is None:
             return
+        # set the attribute directly, bypassing any __setattr__ that
+        # the class defines for changes made after construction
+        object.__setattr__(self, key, self._converters[key](val))
 
-        def convert(val, type_):
-            # if type_ is a list of types, process the inside of the list
-            if (type(type_) in (tuple, list)
-                    and len(type_) == 1
-                    and type(val) in (tuple, list)):
-                return [convert(v, type_[0]) for v in val]
-
-            # if type_ is unspecified or val already matches, we're good
-            elif type_ is any or type(val) == type_:
-                return val
-
-            # if it's a PMMType instantiated with a dict, treat as kwargs
-            elif issubclass(type_, PMMType) and type(val) == dict:
-                return type_(**val)
-
-            elif type_ == str and sys.version_info.major < 3:
-                return (val.encode('UTF-8') if type(val) == unicode
-                        else type_(val))
-
-            # otherwise let type_ try to construct an instance from val
-            # (will raise an error if it's incompatible)
-            else:
-                return type_(val)
-
-        setattr(self, key, convert(val, self.typemap[key]))
-
-    def serializable(self):
+    def serializable(self, order_dicts=False, datetagformat=None):
         """
         Return a serializable (typically ordered) dict representing self
+
+        If order_dicts is set, tags are serialized with their keys in
+        sorted order, as order_tags does; no other dictionaries are changed.
+        If datetagformat is set, dates in tags are serialized as strings
+        in that format; dates anywhere else are left as they are.
         """
 
         # helper to recursively serialize children
         def serialize(val):
             if hasattr(val, 'serializable'):
-                return val.serializable()
-            elif type(val) in (list, tuple):
+                return val.serializable(order_dicts, datetagformat)
+            elif isinstance(val, (list, tuple)):
                 return [serialize(v) for v in val]
             else:
                 return val
 
-        dct = OrderedDict([])
-        for key in (list(self.required.keys()) + list(self.defaulted.keys())
-                    + list(self.optional.keys())):
+        keys = []   # reused for sorting tags
+        dct = ORDERED_DICT_TYPE()
+        for key in self._all_keys:
             if hasattr(self, key):
-                dct[key] = serialize(getattr(self, key))
+                val = getattr(self, key)
+                if key == 'tags' and isinstance(val, dict):
+                    if order_dicts:
+                        val = _sorted_tags(val, keys)
+                    if datetagformat:
+                        val = _formatted_date_tags(val, datetagformat)
+                    dct[key] = val
+                else:
+                    dct[key] = serialize(val)
         return dct
 
 
@@ -219,6 +358,17 @@ class Field(PMMType):
             ('longname', str),
             ('description', str),
     ])
+    _interned = ('name', 'type', 'role')
+
+    _rename_count = 0   # number of times any field has been renamed
+
+    def __setattr__(self, key, value):
+        # Attributes are set directly during construction, so this is
+        # only used for later changes; counting renames lets Metadata tell
+        # when its index of field names might be out of date.
+        if key == 'name':
+            Field._rename_count += 1
+        PMMType.__setattr__(self, key, value)
 
 
 class Metadata(PMMType):
@@ -239,6 +389,10 @@ class Metadata(PMMType):
             ('datetagformat', str),
     ])
 
+    # cached field name -> position, and the fields (and their version)
+    # it was built for
+    _extra_slots = ('_field_index', '_field_index_state')
+
     def __init__(self, *args, **kwargs):
         """
         Instantiate without pmmversion and fieldcount when constructing
@@ -255,6 +409,7 @@ class Metadata(PMMType):
             args.insert(3, len(args[3]))
 
         super(Metadata, self).__init__(*args, **kwargs)
+        self.fields = self.fields   # as a _FieldList (see __setattr__)
 
         if self.fieldcount != len(self.fields):
             raise PMMError('Metadata fieldcount %d <> number of fields %d'
@@ -266,22 +421,42 @@ class Metadata(PMMType):
 
 
     def toJSON(self):
-        self.convert_all_date_tags()
-        self.order_all_tags()
-        jsonStr = json.dumps(self.serializable(), indent=4)
-        self.unconvert_all_date_tags()
-        return u'\n'.join(L.rstrip() for L in jsonStr.splitlines())
+        return json.dumps(self._serializable_for_json(), **JSON_FORMAT)
+
+    def _serializable_for_json(self):
+        """
+        Returns the serializable dict for writing self as JSON, with tags
+        in sorted order and any dates in them formatted as strings
+        (setting datetagformat, if it is not already set, so that
+        they can be read back in as dates).
+        """
+        self._set_date_tag_format()
+        datetagformat = (getattr(self, 'datetagformat', None)
+                         or DEFAULT_DATE_TAG_FORMAT)
+        return self.serializable(order_dicts=True,
+                                 datetagformat=datetagformat)
+
+    def _set_date_tag_format(self):
+        """
+        Ensure that datetagformat is set if any tags have dates as values,
+        so that they can be read back in as dates.
+        """
+        if getattr(self, 'datetagformat', None):
+            return
+        alltags = ([getattr(self, 'tags', _EMPTY)]
+                   + [getattr(f, 'tags', _EMPTY) for f in self.fields])
+        if any(isinstance(v, datetime.datetime)
+               for tags in alltags for v in tags.values()):
+            self.datetagformat = DEFAULT_DATE_TAG_FORMAT
 
     def order_all_tags(self):
-        self.tags = self.order_tags(getattr(self, 'tags', {}))
+        keys = []   # reused for sorting each set of tags
+        self.tags = _sorted_tags(getattr(self, 'tags', _EMPTY), keys)
         for field in self.fields:
-            field.tags = self.order_tags(getattr(field, 'tags', {}))
+            field.tags = _sorted_tags(getattr(field, 'tags', _EMPTY), keys)
 
     def order_tags(self, tags):
-        d = OrderedDict()
-        for tag in sorted(tags):
-            d[tag] = tags[tag]
-        return d
+        return _sorted_tags(tags, [])
 
     def validate_fields(self):
         """
@@ -289,20 +464,29 @@ class Metadata(PMMType):
         and that the types are allowed PMM types.
         Also checks that names are unique, though does not place any
         other restrictions on the names.
+
+        Any fields not yet constructed (after loading) are constructed,
+        which checks their attributes.
         """
-        c = Counter()
+        seen = set()
+        duplicates = []
         for i, f in enumerate(self.fields):
-            if not hasattr(f, 'name'):
+            name = getattr(f, 'name', None)
+            fieldtype = getattr(f, 'type', None)
+            if name is None:
                 raise PMMError('Unknown name for field %d' % i)
-            if not hasattr(f, 'type'):
-                raise PMMError('Missing type for field %s' % f.name)
-            if not f.type in FIELD_TYPES:
-                raise PMMError('Unknown type %s for field %s' % (f.type,
-                                                                 f.name))
-            c[f.name] += 1
-        if any(v > 1 for v in c.values()):
-            raise PMMError('Not all field names are unique:',
-                           ' '.join(k for k in c if c[k] > 1))
+            if fieldtype is None:
+                raise PMMError('Missing type for field %s' % name)
+            if not fieldtype in _FIELD_TYPE_SET:
+                raise PMMError('Unknown type %s for field %s' % (fieldtype,
+                                                                 name))
+            if name in seen:
+                duplicates.append(name)
+            else:
+                seen.add(name)
+        if duplicates:
+            raise PMMError('Not all field names are unique: %s'
+                           % ' '.join(duplicates))
 
     def validate(self):
         """
@@ -312,10 +496,10 @@ class Metadata(PMMType):
 
     def convert_all_date_tags(self):
         datetagformat = getattr(self, 'datetagformat', DEFAULT_DATE_TAG_FORMAT)
-        nDates = self.convert_date_tags(getattr(self, 'tags', OrderedDict()),
+        nDates = self.convert_date_tags(getattr(self, 'tags', _EMPTY),
                                         datetagformat)
         for f in self.fields:
-            nDates += self.convert_date_tags(getattr(f, 'tags', OrderedDict()),
+            nDates += self.convert_date_tags(getattr(f, 'tags', _EMPTY),
                                              datetagformat)
         if nDates:
             self.datetagformat = datetagformat  # ensure set
@@ -324,67 +508,445 @@ class Metadata(PMMType):
         n = 0
         for tag in tags:
             val = tags[tag]
-            if type(val) == datetime.datetime:
+            if isinstance(val, datetime.datetime):
                 tags[tag] = val.strftime(fmt)
                 n += 1
         return n
 
     def unconvert_all_date_tags(self):
         datetagformat = getattr(self, 'datetagformat', DEFAULT_DATE_TAG_FORMAT)
-        self.unconvert_date_tags(getattr(self, 'tags', OrderedDict()),
+        self.unconvert_date_tags(getattr(self, 'tags', _EMPTY),
                                  datetagformat)
         for f in self.fields:
-            self.unconvert_date_tags(getattr(f, 'tags', OrderedDict()),
+            self.unconvert_date_tags(getattr(f, 'tags', _EMPTY),
                                      datetagformat)
 
     def unconvert_date_tags(self, tags, fmt):
+        parse = _date_parser(fmt)
         for tag in tags:
             val = tags[tag]
-            if type(val) == STRING_TYPE:
-                try:
-                    tags[tag] = datetime.datetime.strptime(val, fmt)
-                except ValueError:
-                    pass
+            if isinstance(val, STRING_TYPE):
+                dt = parse(val)
+                if dt is not None:
+                    tags[tag] = dt
 
     def save(self, path):
+        """
+        Writes the metadata to the path given, as JSON.
+
+        Equivalent to writing the result of toJSON, but the JSON is
+        written out as it is encoded, rather than built as a single string.
+        """
+        dct = self._serializable_for_json()
         with open(path, 'w') as f:
-            f.write(self.toJSON())
+            json.dump(dct, f, **JSON_FORMAT)
+
+    def saveb(self, path):
+        """
+        Writes the metadata to the path given, as UTF-8 encoded JSON.
+
+        If orjson is available, it is used to encode the metadata directly
+        to bytes, which is much faster than save for large metadata;
+        the result is then indented by 2 spaces rather than 4.
+        Otherwise, or if the metadata has values orjson can't write
+        faithfully (NaN and infinite floats, which it writes as null,
+        or integers beyond 64 bits), this writes the same bytes as save.
+        """
+        dct = self._serializable_for_json()
+        jsonBytes = None
+        if (orjson is not None
+                and not _has_non_finite_float(_number_containers(dct))):
+            options = orjson.OPT_INDENT_2 | orjson.OPT_PASSTHROUGH_DATETIME
+            try:
+                jsonBytes = orjson.dumps(dct, option=options)
+            except orjson.JSONEncodeError:
+                pass    # e.g. big integers, or dates (which json rejects)
+        if jsonBytes is None:
+            jsonBytes = json.dumps(dct, **JSON_FORMAT).encode('UTF-8')
+        with open(path, 'wb') as f:
+            f.write(jsonBytes)
+
+    def __setattr__(self, key, value):
+        # keep fields in a _FieldList, which tracks changes to it
+        if (key == 'fields' and isinstance(value, list)
+                and not isinstance(value, _FieldList)):
+            value = _FieldList(value)
+        PMMType.__setattr__(self, key, value)
 
     def __getitem__(self, name):
-        for field in self.fields:
-            if field.name == name:
-                return field
-        raise KeyError(name)
+        i = self._field_position(name)
+        if i is None:
+            raise KeyError(name)
+        return self.fields[i]
+
+    def _field_position(self, name):
+        """
+        Returns the position in self.fields of the field with the name
+        given, or None if there is no such field.
+
+        This uses a cached index of the field names. Since self.fields can
+        be changed directly, a cached position is only used if it still
+        holds the named field, and a name missing from the index is only
+        taken to be absent if the index is current (see
+        _field_index_is_current); otherwise the index is rebuilt.
+
+        Fields that have not yet been loaded are not constructed, since
+        the name is available from the raw field.
+        """
+        fields = self.fields
+        index = getattr(self, '_field_index', None)
+        if index is not None:
+            i = index.get(name)
+            if i is None:
+                if self._field_index_is_current():
+                    return None
+            elif (i < len(fields)
+                    and _field_attr(_raw_field(fields, i), 'name') == name):
+                return i
+        index = {}
+        for i, field in enumerate(_raw_fields(fields)):
+            index.setdefault(_field_attr(field, 'name'), i)
+        self._field_index = index
+        self._field_index_state = (fields, _fields_version(fields))
+        return index.get(name)
+
+    def _field_index_is_current(self):
+        """
+        Checks whether the cached field index is known to be up to date,
+        i.e. self.fields is the _FieldList it was built for, and neither
+        that list nor any field's name has changed since.
+        """
+        state = getattr(self, '_field_index_state', None)
+        if state is None:
+            return False
+        fields, version = state
+        return (fields is self.fields and version is not None
+                and version == _fields_version(fields))
 
     def add_field(self, name, fieldMetadata):
         if getattr(fieldMetadata, 'name', None) is None:
             raise Exception('Attempt to add %s metadata with no name: %s'
                             % (name, str(fieldMetadata)))
-        for i, field in enumerate(self.fields):
-            if field.name == name:
-                self.fields[i] = fieldMetadata
-                return
-        self.fields.append(fieldMetadata)
+        fields = self.fields
+        i = self._field_position(name)
+        if i is not None:
+            current = self._field_index_is_current()
+            fields[i] = fieldMetadata
+            if current and fieldMetadata.name == name:
+                self._field_index_state = (fields, _fields_version(fields))
+            return
+        # the index is current (after _field_position), so keep it so
+        self._field_index.setdefault(fieldMetadata.name, len(fields))
+        fields.append(fieldMetadata)
+        self._field_index_state = (fields, _fields_version(fields))
+
+
+def _sorted_tags(tags, keys):
+    """
+    Returns a copy of tags with its keys in sorted order, using the list
+    keys given to sort them in (replacing its contents), so that a single
+    list can be reused when sorting many sets of tags.
+    """
+    keys[:] = tags
+    keys.sort()
+    d = ORDERED_DICT_TYPE()
+    for tag in keys:
+        d[tag] = tags[tag]
+    return d
+
+
+def _formatted_date_tags(tags, fmt):
+    """
+    Returns tags with any dates as values formatted as strings (in a copy,
+    with the same order, if there are any dates), for writing as JSON.
+    """
+    if not any(isinstance(v, datetime.datetime) for v in tags.values()):
+        return tags
+    d = ORDERED_DICT_TYPE()
+    for tag in tags:
+        val = tags[tag]
+        d[tag] = (val.strftime(fmt) if isinstance(val, datetime.datetime)
+                  else val)
+    return d
+
+
+class _FieldList(list):
+    """
+    The list of fields of a Metadata object.
+
+    This is an ordinary list, except that it counts the changes made to
+    it, so that Metadata can tell whether its index of field names is
+    still current.
+    """
+    # _LazyFieldList's slots are declared here too, so that it can turn
+    # itself into a _FieldList once all its fields have been constructed
+    __slots__ = ('_version', 'datetagformat', '_unconstructed')
+
+    def __init__(self, fields=()):
+        list.__init__(self, fields)
+        self._version = 0
+
+
+def _counting(name):
+    """
+    Returns a version of the list method named that counts the change
+    it makes to a _FieldList.
+    """
+    method = getattr(list, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._version = getattr(self, '_version', 0) + 1
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = str(name)
+    return wrapper
+
+
+for _name in ('__setitem__', '__delitem__', '__iadd__', '__imul__',
+              '__setslice__', '__delslice__', 'append', 'extend', 'insert',
+              'pop', 'remove', 'sort', 'reverse', 'clear'):
+    if hasattr(list, _name):
+        setattr(_FieldList, _name, _counting(_name))
+del _name
+
+
+def _fields_version(fields):
+    """
+    Returns a value that changes whenever the list of fields given, or
+    the name of any field, changes, or None if changes to the list can't
+    be tracked (because it isn't a _FieldList).
+    """
+    if isinstance(fields, _FieldList):
+        return (getattr(fields, '_version', 0), Field._rename_count)
+    return None
+
+
+class _LazyFieldList(_FieldList):
+    """
+    The list of fields for metadata read from JSON.
+
+    The list initially holds the fields' parsed JSON dictionaries, and
+    each Field is only constructed (and its date tags interpreted) when
+    it is first accessed, so that reading a PMM file with many fields
+    is cheap when only a few of them are used.
+
+    Anything that needs the whole list (comparisons, searches, repr etc.)
+    constructs all the remaining fields first. Once every field has been
+    constructed, the list changes its class to _FieldList, so that it
+    then performs exactly like an ordinary list.
+    """
+    __slots__ = ()
+
+    def __init__(self, fields, datetagformat=None):
+        _FieldList.__init__(self, fields)
+        self.datetagformat = datetagformat
+        self._unconstructed = 0
+        self._check_constructed()
+
+    def _check_constructed(self):
+        if self._unconstructed <= 0:
+            # recount, in case dictionaries have been added or removed
+            self._unconstructed = sum(1 for f in list.__iter__(self)
+                                      if isinstance(f, dict))
+            if self._unconstructed == 0:
+                self.__class__ = _FieldList
+
+    def _field(self, i):
+        field = list.__getitem__(self, i)
+        if isinstance(field, dict):
+            field = Field(**field)
+            if self.datetagformat:
+                interpret_date_tags(getattr(field, 'tags', _EMPTY),
+                                    self.datetagformat)
+            list.__setitem__(self, i, field)
+            self._unconstructed -= 1
+            self._check_constructed()
+        return field
+
+    def _materialize(self):
+        for i in range(len(self)):
+            if not isinstance(self, _LazyFieldList):
+                break
+            self._field(i)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            self._materialize()
+            return list.__getitem__(self, i)
+        return self._field(i)
+
+    def __iter__(self):
+        i = 0
+        while i < len(self):
+            if isinstance(self, _LazyFieldList):
+                yield self._field(i)
+            else:
+                yield list.__getitem__(self, i)
+            i += 1
+
+    def __reduce_ex__(self, protocol):
+        # pickle (or copy) as the _FieldList this becomes when complete
+        self._materialize()
+        return self.__reduce_ex__(protocol)
+
+    def pop(self, i=-1):
+        self._field(i)
+        return _FieldList.pop(self, i)
+
+    def __radd__(self, other):
+        # needed because list.__add__ copies the unconstructed fields
+        if not isinstance(other, list):
+            return NotImplemented
+        self._materialize()
+        return other + list(list.__iter__(self))
+
+
+def _materializing(name):
+    """
+    Returns a version of the list method named that first constructs
+    any fields in a _LazyFieldList that have not yet been constructed.
+    """
+    method = getattr(_FieldList, name)
+
+    def wrapper(self, *args, **kwargs):
+        self._materialize()
+        return method(self, *args, **kwargs)
+    wrapper.__name__ = str(name)
+    return wrapper
+
+
+for _name in ('__contains__', '__eq__', '__ne__', '__lt__', '__le__',
+              '__gt__', '__ge__', '__add__', '__mul__', '__rmul__',
+              '__reversed__', '__repr__', '__getslice__', 'copy', 'count',
+              'index', 'remove', 'sort'):
+    if hasattr(list, _name):
+        setattr(_LazyFieldList, _name, _materializing(_name))
+del _name
+
+
+def _raw_fields(fields):
+    """
+    Iterates over the fields given without constructing any that have
+    not yet been loaded (which are returned as dictionaries instead).
+    """
+    if isinstance(fields, _LazyFieldList):
+        return list.__iter__(fields)
+    return iter(fields)
+
+
+def _raw_field(fields, i):
+    """
+    Returns the i'th of the fields given, as for _raw_fields.
+    """
+    if isinstance(fields, _LazyFieldList):
+        return list.__getitem__(fields, i)
+    return fields[i]
+
+
+def _field_attr(field, key):
+    """
+    Returns the attribute given of a field, which may be either a Field
+    or the parsed JSON dictionary for one, or None if it is not set.
+    """
+    if isinstance(field, dict):
+        return field.get(key)
+    return getattr(field, key, None)
 
 
 def interpret_all_date_tags(m):
     datetagformat = getattr(m, 'datetagformat', None)
     if not datetagformat:
         return
-    interpret_date_tags(getattr(m, 'tags', OrderedDict()) , datetagformat)
-    for f in getattr(m, 'fields', OrderedDict()):
-        interpret_date_tags(getattr(f, 'tags', OrderedDict()), datetagformat)
+    interpret_date_tags(getattr(m, 'tags', _EMPTY), datetagformat)
+    for f in getattr(m, 'fields', ()):
+        interpret_date_tags(getattr(f, 'tags', _EMPTY), datetagformat)
 
 
 def interpret_date_tags(tags, datetagformat):
+    parse = _date_parser(datetagformat)
     for tag in tags:
         v = tags[tag]
-        if type(v) == STRING_TYPE:
-            try:
-                dt = datetime.datetime.strptime(v, datetagformat)
+        if isinstance(v, STRING_TYPE):
+            dt = parse(v)
+            if dt is not None:
                 tags[tag] = dt
-            except ValueError:
-                pass
+
+
+# Regular expressions matching (at least) everything that strptime accepts
+# for each of the numeric directives in date formats.
+DATE_DIRECTIVE_PATTERNS = {
+    'Y': r'\d{4}',
+    'y': r'\d{2}',
+    'm': r'\d{1,2}',
+    'd': r'(?:\d{1,2}| \d)',
+    'H': r'\d{1,2}',
+    'I': r'\d{1,2}',
+    'M': r'\d{1,2}',
+    'S': r'\d{1,2}',
+    'f': r'\d{1,6}',
+    'j': r'\d{1,3}',
+    '%': '%',
+}
+
+_DATE_STRING_CHECKS = {}    # date format -> function from _date_string_check
+_DATE_PARSERS = {}          # date format -> function from _date_parser
+
+
+def _date_string_check(fmt):
+    """
+    Returns a function that quickly checks whether a string could be a
+    date in the format given, so that strptime (which is slow, especially
+    when it fails) is only called for strings that look like dates.
+
+    The check is a regular expression that matches everything strptime
+    would accept (strptime also treats whitespace in the format as any
+    run of whitespace, and ignores case). If the format uses directives
+    not in DATE_DIRECTIVE_PATTERNS, the check always passes.
+    """
+    check = _DATE_STRING_CHECKS.get(fmt)
+    if check is None:
+        parts = []
+        for part in re.split(r'(%.)', fmt):
+            if len(part) == 2 and part.startswith('%'):
+                pattern = DATE_DIRECTIVE_PATTERNS.get(part[1])
+            elif '%' in part:
+                pattern = None      # stray %, which strptime rejects
+            else:
+                pattern = r'\s+'.join(re.escape(literal)
+                                      for literal in re.split(r'\s+', part))
+            if pattern is None:
+                check = lambda s: True
+                break
+            parts.append(pattern)
+        else:
+            check = re.compile('(?:%s)\\Z' % ''.join(parts),
+                               re.IGNORECASE).match
+        _DATE_STRING_CHECKS[fmt] = check
+    return check
+
+
+def _date_parser(fmt):
+    """
+    Returns a function that parses a string as a date in the format given,
+    returning None if it isn't one.
+
+    The parser is built once for each format, and only calls strptime
+    for strings that pass _date_string_check for the format.
+    """
+    parse = _DATE_PARSERS.get(fmt)
+    if parse is None:
+        could_be_date = _date_string_check(fmt)
+        strptime = datetime.datetime.strptime
+
+        def parse(s):
+            if could_be_date(s):
+                try:
+                    return strptime(s, fmt)
+                except ValueError:
+                    pass
+            return None
+
+        _DATE_PARSERS[fmt] = parse
+    return parse
 
 
 def load(path):
@@ -401,8 +963,102 @@ def loads(jsonText):
     """
     Converts the JSON text given into a Metadata object.
     """
-    m = Metadata(**json.loads(jsonText))
-    interpret_all_date_tags(m)
+    dct = _parse_json(jsonText)
+    datetagformat = dct.get('datetagformat')
+    if isinstance(dct.get('fields'), list):
+        dct['fields'] = _LazyFieldList(dct['fields'], datetagformat)
+    m = Metadata(**dct)
+    if datetagformat:
+        interpret_date_tags(getattr(m, 'tags', _EMPTY), datetagformat)
     return m
 
 
+def _parse_json(jsonText):
+    """
+    Parses JSON text, using orjson if it is available, since it is much
+    faster than the standard json module.
+
+    orjson is stricter than json (e.g. it rejects NaN), so anything it
+    fails to parse is passed on to json. orjson also parses integers that
+    don't fit in 64 bits as floats, so the text is parsed again with json
+    if any of the values that can be arbitrary numbers might be one.
+    """
+    if orjson is not None:
+        try:
+            dct = orjson.loads(jsonText)
+        except orjson.JSONDecodeError:
+            pass
+        else:
+            if not _has_big_number(dct):
+                return dct
+    return json.loads(jsonText)
+
+
+def _has_big_number(dct):
+    """
+    Checks whether parsed PMM JSON might have an integer too large for
+    64 bits (which orjson parses as a float).
+    """
+    return _has_big_integral_float(_number_containers(dct))
+
+
+def _number_containers(dct):
+    """
+    Returns the parts of a PMM dictionary (as parsed from JSON, or from
+    serializable) that can hold arbitrary numbers: its tags, and its
+    fields' tags, values and stats.
+    """
+    if not isinstance(dct, dict):
+        return []
+    containers = [dct.get('tags')]
+    fields = dct.get('fields')
+    if isinstance(fields, list):
+        for field in fields:
+            if isinstance(field, dict):
+                containers.append(field.get('tags'))
+                containers.append(field.get('values'))
+                containers.append(field.get('stats'))
+    return containers
+
+
+def _has_big_integral_float(values):
+    """
+    Checks whether any of the values given (recursively, through lists
+    and dictionaries) is an integral float of magnitude at least 2**63.
+    """
+    for v in values:
+        t = type(v)
+        if t is float:
+            if ((v >= _TWO_TO_THE_63 or v <= -_TWO_TO_THE_63)
+                    and v.is_integer()):
+                return True
+        elif t is dict:
+            if _has_big_integral_float(v.values()):
+                return True
+        elif t is list:
+            if _has_big_integral_float(v):
+                return True
+    return False
+
+
+_TWO_TO_THE_63 = float(2 ** 63)
+
+
+def _has_non_finite_float(values):
+    """
+    Checks whether any of the values given (recursively, through lists
+    and dictionaries) is a NaN or infinite float.
+    """
+    for v in values:
+        if isinstance(v, float):
+            if math.isnan(v) or math.isinf(v):
+                return True
+        elif isinstance(v, dict):
+            if _has_non_finite_float(v.values()):
+                return True
+        elif isinstance(v, (list, tuple)):
+            if _has_non_finite_float(v):
+                return True
+    return False
+
+
@@ -0,0 +1,266 @@
+# -*- coding: utf-8 -*-
+"""
+testfeatherpmm.py: tests for featherpmm.py
+"""
+from __future__ import division
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from pmmif import featherpmm
+from pmmif.featherpmm import (Dataset, read_dataframe, write_dataframe,
+                              feather, NULL_SUFFIX)
+
+
+@unittest.skipIf(feather is None, 'pyarrow is not available')
+class FeatherTestCase(unittest.TestCase):
+    def setUp(self):
+        self.outdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.outdir)
+
+    def path(self, name):
+        return os.path.join(self.outdir, name + '.feather')
+
+
+def allNull(n):
+    # all-null columns are restored as object columns of NaNs
+    return np.full(n, np.nan, dtype=object)
+
+
+def sampleDataFrame(n=10):
+    return pd.DataFrame({
+        'n': np.arange(n),
+        'x': np.linspace(0.0, 1.0, n),
+        's': [None] * (n // 2) + ['s%d' % i for i in range(n - n // 2)],
+        'b': [i % 3 == 0 for i in range(n)],
+        'z': allNull(n),
+    })
+
+
+class ChunkedWriteTests(FeatherTestCase):
+    def checkChunkedWrite(self, df, chunksize=3):
+        ds = Dataset(df, name='chunked')
+        ds.declare_field('z', 'string')
+        chunkedpath = self.path('chunked')
+        plainpath = self.path('plain')
+        write_dataframe(ds, chunkedpath, chunksize=chunksize)
+        write_dataframe(ds, plainpath)
+
+        # the feather files hold the same data as one written (whole)
+        # by feather.write_feather
+        pd.testing.assert_frame_equal(feather.read_feather(chunkedpath),
+                                      feather.read_feather(plainpath))
+
+        # and the datasets read back match the original
+        chunked = read_dataframe(chunkedpath)
+        pd.testing.assert_frame_equal(chunked.df, df)
+        self.assertEqual(chunked.md.toJSON(),
+                         read_dataframe(plainpath).md.toJSON())
+        return chunkedpath
+
+    def testChunkedWrite(self):
+        path = self.checkChunkedWrite(sampleDataFrame(10), chunksize=3)
+        self.assertEqual(featherpmm.pa.ipc.open_file(path)
+                                   .num_record_batches, 4)
+
+    def testChunkedWriteOneChunk(self):
+        self.checkChunkedWrite(sampleDataFrame(10), chunksize=100)
+
+    def testChunkedWriteEmpty(self):
+        self.checkChunkedWrite(sampleDataFrame(10).iloc[:0], chunksize=3)
+
+    def testChunkedWriteIndexed(self):
+        self.checkChunkedWrite(sampleDataFrame(10).set_index('n'),
+                               chunksize=4)
+
+    def testChunkedSchema(self):
+        # the schema is inferred from the first chunk, but matches the one
+        # inferred from the whole dataframe, even for a column that is
+        # all null in the first chunk
+        df = sampleDataFrame(10)
+        self.assertEqual(featherpmm._chunked_schema(df, 3),
+                         featherpmm.pa.Schema.from_pandas(df))
+
+    def testChunkedWriteMixedTypes(self):
+        # later chunks that don't match the first chunk's schema
+        df = pd.DataFrame({'m': [None, None, None, 1, 2.5]})
+        path = self.path('mixed')
+        write_dataframe(Dataset(df, name='mixed'), path, chunksize=3)
+        pd.testing.assert_frame_equal(
+            feather.read_feather(path),
+            pd.DataFrame({'m': [np.nan, np.nan, np.nan, 1.0, 2.5]}))
+
+    def testBadChunksize(self):
+        ds = Dataset(sampleDataFrame(10), name='bad')
+        path = self.path('bad')
+        for chunksize in (0, -1, 2.5, '3', True):
+            self.assertRaises(ValueError, write_dataframe, ds, path,
+                              chunksize=chunksize)
+            self.assertFalse(os.path.exists(path))
+
+
+class CompressionTests(FeatherTestCase):
+    def testCompressionRoundTrip(self):
+        df = sampleDataFrame(1000)
+        sizes = {}
+        for compression in ('uncompressed', 'lz4', 'zstd', None):
+            if (compression not in ('uncompressed', None)
+                    and not featherpmm.pa.Codec.is_available(compression)):
+                continue
+            for chunksize in (None, 300):
+                ds = Dataset(df, name='compressed')
+                ds.declare_field('z', 'string')
+                path = self.path('compressed')
+                write_dataframe(ds, path, compression=compression,
+                                chunksize=chunksize)
+                pd.testing.assert_frame_equal(read_dataframe(path).df, df)
+                sizes[compression, chunksize] = os.path.getsize(path)
+        for chunksize in (None, 300):
+            for compression in ('lz4', 'zstd'):
+                if (compression, chunksize) in sizes:
+                    self.assertLess(sizes[compression, chunksize],
+                                    sizes['uncompressed', chunksize])
+
+    def testMemoryMapRead(self):
+        df = sampleDataFrame(10)
+        ds = Dataset(df, name='mapped')
+        ds.declare_field('z', 'string')
+        ds.tag_field('n', 'key')
+        path = self.path('mapped')
+        write_dataframe(ds, path)
+        mapped = read_dataframe(path, memory_map=True)
+        pd.testing.assert_frame_equal(mapped.df, df)
+        self.assertEqual(mapped.md.toJSON(), read_dataframe(path).md.toJSON())
+        self.assertEqual(mapped.md['n'].tags, {'key': None})
+
+
+class AllNullColumnTests(FeatherTestCase):
+    def testSanitizeRecover(self):
+        df = sampleDataFrame(6)
+        df['allnull'] = allNull(6)
+        ds = Dataset(df, name='nulls')
+        ds.declare_field('z', 'string')
+        ds.declare_field('allnull', 'boolean')
+        path = self.path('nulls')
+        write_dataframe(ds, path)
+
+        # the dataset's own dataframe is not changed
+        self.assertEqual(list(ds.df.columns), list(df.columns))
+
+        # all-null string and boolean columns are written as float columns
+        raw = feather.read_feather(path)
+        self.assertEqual(list(raw.columns),
+                         ['n', 'x', 's', 'b', 'z' + NULL_SUFFIX + 's',
+                          'allnull' + NULL_SUFFIX + 'b'])
+        self.assertEqual(raw['z' + NULL_SUFFIX + 's'].dtype,
+                         np.dtype('float64'))
+        self.assertTrue(raw['z' + NULL_SUFFIX + 's'].isnull().all())
+
+        # and are restored, with their original names, when read back
+        recovered = read_dataframe(path)
+        self.assertEqual(list(recovered.df.columns), list(df.columns))
+        pd.testing.assert_frame_equal(recovered.df, df)
+        self.assertEqual([(f.name, f.type) for f in recovered.md.fields],
+                         [('n', 'integer'), ('x', 'real'), ('s', 'string'),
+                          ('b', 'boolean'), ('z', 'string'),
+                          ('allnull', 'boolean')])
+
+    def testSanitizeRecoverEmpty(self):
+        df = pd.DataFrame({'s': pd.Series([], dtype=object),
+                           'b': pd.Series([], dtype=bool)})
+        ds = Dataset(df, name='empty')
+        ds.declare_field('s', 'string')
+        path = self.path('empty')
+        write_dataframe(ds, path)
+        self.assertEqual(list(feather.read_feather(path).columns),
+                         ['s' + NULL_SUFFIX + 's', 'b' + NULL_SUFFIX + 'b'])
+        recovered = read_dataframe(path)
+        self.assertEqual(list(recovered.df.columns), ['s', 'b'])
+        self.assertEqual(recovered.df.dtypes.tolist(),
+                         [np.dtype('O'), np.dtype('bool')])
+
+    def testNothingToSanitize(self):
+        df = sampleDataFrame(4).drop(columns=['z'])
+        ds = Dataset(df, name='clean')
+        self.assertIs(featherpmm._sanitize_problematical_all_null_columns(ds),
+                      ds.df)
+
+
+class AppendTests(unittest.TestCase):
+    def datasets(self):
+        first = Dataset(pd.DataFrame({'a': [1, 2], 'b': ['x', 'y']}),
+                        name='first')
+        second = Dataset(pd.DataFrame({'a': [3], 'c': [1.5]}), name='second')
+        second.tag_field('c', 'units', 'kg')
+        third = Dataset(pd.DataFrame({'b': ['z'], 'd': [True]}),
+                        name='third')
+        return first, [second, third]
+
+    def testExtend(self):
+        appended, others = self.datasets()
+        for other in others:
+            appended.append(other)
+        extended, others = self.datasets()
+        extended.extend(others)
+
+        pd.testing.assert_frame_equal(extended.df, appended.df)
+        self.assertEqual(list(extended.df.columns), ['a', 'b', 'c', 'd'])
+        self.assertEqual(extended.md.toJSON(), appended.md.toJSON())
+        self.assertEqual([f.name for f in extended.md.fields],
+                         ['a', 'b', 'c', 'd'])
+        self.assertEqual(extended.md['c'].tags, {'units': 'kg'})
+        self.assertEqual(extended.md.fieldcount, 4)
+
+    def testExtendNothing(self):
+        ds, others = self.datasets()
+        ds.extend([])
+        self.assertEqual(list(ds.df.columns), ['a', 'b'])
+        self.assertEqual(len(ds.df), 2)
+
+
+class MetadataTests(unittest.TestCase):
+    def testPmmTypes(self):
+        df = pd.DataFrame({
+            'u8': np.array([1, 2, 255], dtype='uint8'),
+            'i': np.array([-1, 0, 1], dtype='int64'),
+            'f': [1.5, np.nan, 2.0],
+            'b': [True, False, True],
+            's': ['x', None, 'z'],
+            'ob': [None, True, False],
+            'd': pd.to_datetime(['2017-01-01', None, '2017-01-03']),
+        })
+        md = featherpmm._create_pmm_metadata(df, 'types')
+        self.assertEqual([(f.name, f.type) for f in md.fields],
+                         [('u8', 'integer'), ('i', 'integer'), ('f', 'real'),
+                          ('b', 'boolean'), ('s', 'string'),
+                          ('ob', 'boolean'), ('d', 'datestamp')])
+        self.assertEqual(md.recordcount, 3)
+        md.validate()
+
+
+class StringConversionTests(unittest.TestCase):
+    def testUnicodeDefiniteObject(self):
+        obj = {b'key': [b'caf\xc3\xa9', (b'x', 1, None), {b'k': b'v'}],
+               'other': 2.5}
+        self.assertEqual(featherpmm._unicode_definite_object(obj),
+                         {'key': ['caf\xe9', ('x', 1, None), {'k': 'v'}],
+                          'other': 2.5})
+
+    def testUtf8DefiniteObject(self):
+        obj = {'key': ['caf\xe9', ('x', 1, None), {'k': 'v'}]}
+        self.assertEqual(featherpmm._utf8_definite_object(obj),
+                         {b'key': [b'caf\xc3\xa9', (b'x', 1, None),
+                                   {b'k': b'v'}]})
+
+
+if __name__ == '__main__':
+    unittest.main()
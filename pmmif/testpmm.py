@@ -7,18 +7,27 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 import os
+import datetime
 import json
+import math
 import tempfile
 import unittest
 
 from pprint import pprint as pp
 
 from pmmif.pmm import (Metadata, Field, Stats, Data, FlatFile, FlatFileFormat,
-                       ROLE, TAG, load)
+                       ROLE, TAG, PMMError, load, loads)
 
 HILLSTROM_PMM_VERSION = '0.1'
 
 
+def attributes(elt):
+    """
+    Names of the attributes that have been set on a PMM element.
+    """
+    return list(elt.serializable().keys())
+
+
 class LoadTests(unittest.TestCase):
     indir = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
     outdir = tempfile.gettempdir()
@@ -50,7 +59,7 @@ class LoadTests(unittest.TestCase):
 
         # Basic Metadata
 
-        self.assertEqual(set(m.__dict__.keys()),
+        self.assertEqual(set(attributes(m)),
                          {'name',
                           'recordcount',
                           'fields',
@@ -66,12 +75,12 @@ class LoadTests(unittest.TestCase):
         # The data section describes a single flat file
         # named hillstrom.csv with the following format
 
-        self.assertEqual(list(m.data.__dict__.keys()), ['flatfile'])
+        self.assertEqual(attributes(m.data), ['flatfile'])
         f = m.data.flatfile
-        self.assertEqual(set(f.__dict__.keys()), {'name', 'format'})
+        self.assertEqual(set(attributes(f)), {'name', 'format'})
         self.assertEqual(f.name, 'hillstrom.csv')
         fmt = f.format
-        self.assertEqual(set(fmt.__dict__.keys()),
+        self.assertEqual(set(attributes(fmt)),
                          {
                              'encoding',
                              'escape',
@@ -123,6 +132,110 @@ class LoadTests(unittest.TestCase):
                          ])
 
 
+    def testGetItem(self):
+        m = load(os.path.join(self.indir, 'hillstrom.pmm'))
+        self.assertEqual(m['spend'].type, 'real')
+        self.assertEqual(m['mens'].type, 'boolean')
+        self.assertRaises(KeyError, lambda: m['nosuchfield'])
+
+        # the fields can be changed directly, without going through m
+        del m.fields[0]
+        m.fields.append(Field('extra', 'string', ROLE.UNSPECIFIED, {},
+                              Stats()))
+        self.assertEqual(m['extra'].type, 'string')
+        self.assertEqual(m['spend'].type, 'real')
+        self.assertRaises(KeyError, lambda: m['recency'])
+        m.fields = list(reversed(m.fields))
+        self.assertEqual(m['extra'], m.fields[0])
+
+    def testSaveb(self):
+        for pmmfile in ['hillstrom.pmm', 'victorlo.pmm']:
+            m = load(os.path.join(self.indir, pmmfile))
+            outpath = os.path.join(self.outdir, 'saveb-' + pmmfile)
+            m.saveb(outpath)
+            self.assertEqual(load(outpath).toJSON(), m.toJSON())
+            os.unlink(outpath)
+
+        inf = float('inf')
+        m = Metadata('nonfinite', 1,
+                     [Field('f', 'real', ROLE.INDEPENDENT,
+                            {'nan': float('nan'), 'list': [1.5, -inf]},
+                            Stats(mean=float('nan'), max=inf))],
+                     tags={'inf': inf})
+        outpath = os.path.join(self.outdir, 'saveb-nonfinite.pmm')
+        m.saveb(outpath)
+        m2 = load(outpath)
+        os.unlink(outpath)
+        self.assertEqual(m2.tags, {'inf': inf})
+        f = m2['f']
+        self.assertTrue(math.isnan(f.tags['nan']))
+        self.assertEqual(f.tags['list'], [1.5, -inf])
+        self.assertTrue(math.isnan(f.stats.mean))
+        self.assertEqual(f.stats.max, inf)
+
+    def testLazyFields(self):
+        path = os.path.join(self.indir, 'hillstrom.pmm')
+        m = load(path)
+        m.validate()
+        self.assertEqual(m['spend'].type, 'real')
+        self.assertEqual(m.fields[-1].name, 'spend')
+        self.assertEqual([f.name for f in m.fields[3:5]], ['mens', 'womens'])
+        self.assertEqual(next(reversed(m.fields)).name, 'spend')
+        self.assertEqual(m.fields.pop(0).name, 'recency')
+        self.assertEqual(len(m.fields), 11)
+        self.assertEqual([f.name for f in m.fields],
+                         [f.name for f in load(path).fields[1:]])
+        self.assertTrue(all(isinstance(f, Field) for f in m.fields))
+        self.assertEqual(m.fields.index(m['channel']), 6)
+        self.assertTrue(all(isinstance(f, Field)
+                            for f in [] + load(path).fields))
+
+        # once all the fields are constructed, the fields are iterated
+        # (and indexed) as an ordinary list
+        m = load(path)
+        fields = m.fields
+        self.assertNotEqual(type(iter(fields)), type(iter([])))
+        for i in range(len(fields)):
+            fields[i]
+        self.assertIs(m.fields, fields)
+        self.assertEqual(type(iter(fields)), type(iter([])))
+        self.assertEqual(m['spend'].type, 'real')
+
+        # validation constructs (and so checks) every field
+        dct = json.loads(load(path).toJSON())
+        dct['fields'][3]['bogus'] = 1
+        m = loads(json.dumps(dct))
+        self.assertRaises(PMMError, m.validate)
+
+    def testLargeIntegers(self):
+        tags = {'big': 2 ** 70, 'negative': -2 ** 63 - 1, 'small': 17}
+        m = Metadata('ints', 1,
+                     [Field('f', 'integer', ROLE.INDEPENDENT,
+                            {'nested': [{'big': 2 ** 70}]},
+                            Stats(min=-2 ** 64, max=2 ** 64 + 1),
+                            values=[1, 2 ** 65])],
+                     tags=tags)
+        m2 = loads(m.toJSON())
+        self.assertEqual(m2.tags, tags)
+        f = m2['f']
+        self.assertEqual(f.tags, {'nested': [{'big': 2 ** 70}]})
+        self.assertEqual((f.stats.min, f.stats.max), (-2 ** 64, 2 ** 64 + 1))
+        self.assertEqual(f.values, [1, 2 ** 65])
+
+    def testTagOrder(self):
+        # tags are written in key order, but other dictionaries are not
+        m = Metadata('order', 1,
+                     [Field('f', 'string', ROLE.INDEPENDENT,
+                            {'b': 1, 'a': {'z': 1, 'y': 2}}, Stats(),
+                            values=[{'z': 1, 'y': 2}, {1: 'x', 'a': 'y'}])],
+                     tags={'z': 1, 'y': 2})
+        dct = json.loads(m.toJSON(), object_pairs_hook=list)
+        self.assertEqual(dct[-1], ('tags', [('y', 2), ('z', 1)]))
+        f = dict(dict(dct)['fields'][0])
+        self.assertEqual(f['tags'], [('a', [('z', 1), ('y', 2)]), ('b', 1)])
+        self.assertEqual(f['values'], [[('z', 1), ('y', 2)],
+                                       [('1', 'x'), ('a', 'y')]])
+
 
 def buildVictorLo():
     m = Metadata('victorlo', 99999,
@@ -152,6 +265,117 @@ class ConstructTests(unittest.TestCase):
     def testVictorLo(self):
         buildVictorLo()
 
+    def testAddField(self):
+        m = Metadata('add', 1, [], tags={})
+        for name in ('a', 'b', 'c'):
+            m.add_field(name, Field(name, 'real', ROLE.INDEPENDENT, {},
+                                    Stats()))
+        m.add_field('b', Field('b', 'string', ROLE.INDEPENDENT, {}, Stats()))
+        self.assertEqual([f.name for f in m.fields], ['a', 'b', 'c'])
+        self.assertEqual(m['b'].type, 'string')
+
+        # fields changed directly are still found
+        del m.fields[0]
+        m.fields.append(Field('a', 'real', ROLE.INDEPENDENT, {}, Stats()))
+        m.add_field('a', Field('a', 'integer', ROLE.INDEPENDENT, {}, Stats()))
+        self.assertEqual([f.name for f in m.fields], ['b', 'c', 'a'])
+        self.assertEqual(m['a'].type, 'integer')
+
+        # including by item assignment, insertion and renaming
+        self.assertEqual(m['b'].type, 'string')
+        m.fields[0] = Field('d', 'real', ROLE.INDEPENDENT, {}, Stats())
+        m.add_field('d', Field('d', 'integer', ROLE.INDEPENDENT, {}, Stats()))
+        del m.fields[1]
+        m.fields.insert(1, Field('e', 'real', ROLE.INDEPENDENT, {}, Stats()))
+        m.add_field('e', Field('e', 'integer', ROLE.INDEPENDENT, {}, Stats()))
+        m.fields[2].name = 'f'
+        m.add_field('f', Field('f', 'integer', ROLE.INDEPENDENT, {}, Stats()))
+        self.assertEqual([f.name for f in m.fields], ['d', 'e', 'f'])
+        self.assertEqual([f.type for f in m.fields], ['integer'] * 3)
+        m.validate()
+
+        # as are fields in a list assigned directly, including via sort
+        m.fields = [Field(name, 'real', ROLE.INDEPENDENT, {}, Stats())
+                    for name in ('y', 'x')]
+        m.fields.sort(key=lambda f: f.name)
+        m.add_field('y', Field('y', 'integer', ROLE.INDEPENDENT, {}, Stats()))
+        self.assertEqual([(f.name, f.type) for f in m.fields],
+                         [('x', 'real'), ('y', 'integer')])
+
+    def testAddFieldIndex(self):
+        # adding new fields one at a time doesn't rebuild the field index
+        m = Metadata('add', 0, [], tags={})
+        m.add_field('f0', Field('f0', 'real', ROLE.INDEPENDENT, {}, Stats()))
+        index = m._field_index
+        for i in range(1, 100):
+            name = 'f%d' % i
+            m.add_field(name, Field(name, 'real', ROLE.INDEPENDENT, {},
+                                    Stats()))
+        m.add_field('f50', Field('f50', 'integer', ROLE.INDEPENDENT, {},
+                                 Stats()))
+        self.assertRaises(KeyError, lambda: m['nosuchfield'])
+        self.assertIs(m._field_index, index)
+        self.assertEqual(len(m.fields), 100)
+        self.assertEqual(m['f50'].type, 'integer')
+        self.assertIs(m['f99'], m.fields[99])
+
+    def testValidateFields(self):
+        fields = [Field(name, 'real', ROLE.INDEPENDENT, {}, Stats())
+                  for name in ('a', 'b', 'a', 'c', 'b')]
+        m = Metadata('dups', 1, fields, tags={})
+        with self.assertRaises(PMMError) as cm:
+            m.validate()
+        self.assertEqual(str(cm.exception),
+                         'Not all field names are unique: a b')
+        m.fields[2].name = 'd'
+        m.fields[4].name = 'e'
+        m.validate()
+
+
+class DateTagTests(unittest.TestCase):
+    def testDateTagRoundTrip(self):
+        when = datetime.datetime(2017, 3, 14, 15, 9, 26)
+        tags = {
+            'when': when,
+            'notdate': 'hello',
+            'baddate': '2017-13-45 00:00:00',
+            'number': 17,
+        }
+        m = Metadata('dates', 1,
+                     [Field('f', 'real', ROLE.INDEPENDENT, dict(tags),
+                            Stats())],
+                     tags=dict(tags))
+        m2 = loads(m.toJSON())
+        self.assertEqual(m2.datetagformat, '%Y-%m-%d %H:%M:%S')
+        self.assertEqual(m2.tags, tags)
+        self.assertEqual(m2['f'].tags, tags)
+
+        m.datetagformat = '%d/%m/%Y'
+        m2 = loads(m.toJSON())
+        self.assertEqual(m2.tags['when'], datetime.datetime(2017, 3, 14))
+        self.assertEqual(m2.tags['baddate'], '2017-13-45 00:00:00')
+
+        # saveb writes date tags the same way
+        outpath = os.path.join(tempfile.gettempdir(), 'saveb-dates.pmm')
+        m.saveb(outpath)
+        m2 = load(outpath)
+        os.unlink(outpath)
+        self.assertEqual(m2.tags['when'], datetime.datetime(2017, 3, 14))
+
+    def testDatesOutsideTags(self):
+        # only dates in tags can be written
+        when = datetime.datetime(2017, 3, 14)
+        outpath = os.path.join(tempfile.gettempdir(), 'dates.pmm')
+        for field in (Field('f', 'datestamp', ROLE.INDEPENDENT, {},
+                            Stats(min=when, max=when)),
+                      Field('f', 'datestamp', ROLE.INDEPENDENT, {}, Stats(),
+                            values=[when])):
+            m = Metadata('dates', 1, [field], tags={})
+            self.assertRaises(TypeError, m.toJSON)
+            self.assertRaises(TypeError, m.saveb, outpath)
+            self.assertFalse(hasattr(m, 'datetagformat'))
+        if os.path.exists(outpath):
+            os.unlink(outpath)
 
 
 if __name__ == '__main__':